@@ -2,6 +2,7 @@ import streamlit as st
 from datetime import datetime
 import json
 import os
+import numpy as np
 import pandas as pd
 
 # ----- PRISER / KONSTANTER -----
@@ -21,7 +22,7 @@ INSTALLATION_COST = 5000    # bakas in i månadsbetalningen
 SERVICE_HALF_YEAR = 594
 SERVICE_MONTHLY = SERVICE_HALF_YEAR / 6  # ≈ 99 kr/mån
 
-PAYMENT_OPTIONS = [
+PAYMENT_OPTIONS = (
     ("90 dagar (3 mån)", 3),
     ("12 månader", 12),
     ("24 månader", 24),
@@ -29,9 +30,10 @@ PAYMENT_OPTIONS = [
     ("60 månader", 60),
     ("72 månader", 72),
     ("120 månader", 120),
-]
+)
 
-CUSTOMER_FILE = "customers.json"
+CUSTOMER_FILE = "customers.jsonl"          # en kund per rad (JSON Lines)
+LEGACY_CUSTOMER_FILE = "customers.json"     # gammalt format, migreras vid start
 
 # Provision/bonus-konstanter
 BASE_COMMISSION_PER_DEAL = 2500          # Startpaket provision
@@ -40,26 +42,89 @@ UPSELL_COMMISSION_RATE = 0.10            # 10% på merförsäljning
 COMPENSATION_PENALTY_RATE = 0.20         # -20% på total provision vid kundkompensation
 MILE_COMP = 25.50                        # kr/mil
 
+# Bonustrappa: (minsta antal nettoförsäljningar, bonus i kr)
+BONUS_TIERS = (
+    (10, 5000),
+    (15, 10000),
+    (20, 15000),
+    (30, 30000),
+    (40, 40000),
+    (50, 50000),
+)
+
 
 # ----- HJÄLPFUNKTIONER -----
 
 
+def _read_only(values, dtype=None):
+    """NumPy-array som är skrivskyddad (uppslagstabell)."""
+    arr = np.array(values, dtype=dtype)
+    arr.flags.writeable = False
+    return arr
+
+
+# Uppslagstabeller för NumPy, i samma ordning som PAYMENT_OPTIONS / BONUS_TIERS
+_MONTHS = _read_only([months for _, months in PAYMENT_OPTIONS], dtype=np.int64)
+_LABELS = _read_only([label for label, _ in PAYMENT_OPTIONS])
+# Styckpris per tillval: magnet, kamera, brandvarnare
+_EXTRA_PRICES = _read_only([EXTRA_MAGNET, EXTRA_CAMERA, EXTRA_FIRE], dtype=np.int64)
+# Bonus för np.searchsorted: 0 under lägsta tröskeln
+_BONUS_THRESHOLDS = _read_only([threshold for threshold, _ in BONUS_TIERS])
+_BONUS_VALUES = _read_only([0] + [bonus for _, bonus in BONUS_TIERS])
+
+
 def compute_plans(financed_amount: float):
-    """Räknar ut alla planer (månad, total) för alla bindningstider."""
-    plans = []
-    for label, months in PAYMENT_OPTIONS:
-        monthly_fin = financed_amount / months
-        monthly_total = monthly_fin + ADMIN_MONTHLY
-        total_cost = monthly_total * months + START_FEE
-        plans.append(
-            {
-                "label": label,
-                "months": months,
-                "monthly": monthly_total,
-                "total": total_cost,
-            }
-        )
-    return plans
+    """Räknar ut alla planer (månad, total) för alla bindningstider.
+
+    Returnerar en dict med NumPy-arrayer label, months, monthly och total,
+    ett element per bindningstid i PAYMENT_OPTIONS-ordning.
+    """
+    monthly = financed_amount / _MONTHS + ADMIN_MONTHLY
+    total = monthly * _MONTHS + START_FEE
+    return {
+        "label": _LABELS,
+        "months": _MONTHS,
+        "monthly": monthly,
+        "total": total,
+    }
+
+
+def plan_at(plans, i: int):
+    """Plan nr i ur compute_plans som dict med vanliga Python-typer."""
+    return {
+        "label": str(plans["label"][i]),
+        "months": int(plans["months"][i]),
+        "monthly": float(plans["monthly"][i]),
+        "total": float(plans["total"][i]),
+    }
+
+
+def plan_key(plan):
+    """Plan-dict som hashbar tuple (label, months, monthly, total)."""
+    return (plan["label"], plan["months"], plan["monthly"], plan["total"])
+
+
+@st.cache_data(max_entries=128)
+def plans_table(financed_amount: float) -> pd.DataFrame:
+    """Tabell för "Alla planer" med visningsnamn och avrundade värden.
+
+    Cachas per finansierat belopp.
+    """
+    plans = compute_plans(financed_amount)
+    return pd.DataFrame(
+        {
+            "Plan": plans["label"],
+            "Månader": plans["months"],
+            "kr/mån": plans["monthly"].round(2),
+            "Totalt (kr)": plans["total"].round(2),
+        }
+    )
+
+
+def show_plans_table(title: str, financed_amount: float):
+    """Rubrik + tabell över alla planer för ett finansierat belopp."""
+    st.markdown(f"**{title}**")
+    st.dataframe(plans_table(financed_amount), use_container_width=True)
 
 
 def choose_best_plan_for_budget(plans, target_monthly: float):
@@ -68,14 +133,11 @@ def choose_best_plan_for_budget(plans, target_monthly: float):
     - Om det finns alternativ <= budget: ta det som är närmast budget (högst monthly).
     - Annars: ta lägsta månadskostnaden.
     """
-    under_or_equal = [p for p in plans if p["monthly"] <= target_monthly]
-    if under_or_equal:
-        best = max(under_or_equal, key=lambda p: p["monthly"])
-        status = "within"
-    else:
-        best = min(plans, key=lambda p: p["monthly"])
-        status = "above"
-    return best, status
+    monthly = plans["monthly"]
+    within = np.flatnonzero(monthly <= target_monthly)
+    if within.size:
+        return plan_at(plans, int(within[np.argmax(monthly[within])])), "within"
+    return plan_at(plans, int(np.argmin(monthly))), "above"
 
 
 def choose_discount_plan_to_match_price(plans, target_monthly: float, tolerance: float):
@@ -87,14 +149,16 @@ def choose_discount_plan_to_match_price(plans, target_monthly: float, tolerance:
     """
     lower = target_monthly - tolerance
     upper = target_monthly + tolerance
-    candidates = [p for p in plans if lower <= p["monthly"] <= upper]
+    monthly = plans["monthly"]
+    candidates = np.flatnonzero((monthly >= lower) & (monthly <= upper))
+    dist = np.abs(monthly - target_monthly)
 
-    if candidates:
-        candidates.sort(key=lambda p: (p["months"], abs(p["monthly"] - target_monthly)))
-        return candidates[0], True
+    if candidates.size:
+        # Sortera på (bindningstid, avstånd) – lexsort tar sista nyckeln först
+        order = np.lexsort((dist[candidates], _MONTHS[candidates]))
+        return plan_at(plans, int(candidates[order[0]])), True
 
-    nearest = min(plans, key=lambda p: abs(p["monthly"] - target_monthly))
-    return nearest, False
+    return plan_at(plans, int(np.argmin(dist))), False
 
 
 def seller_breakdown(
@@ -106,73 +170,108 @@ def seller_breakdown(
     charged_magnet,
     charged_camera,
     charged_fire,
+    extras_total_full,
+    extras_charged,
     financed_amount,
     plan,
     tag,
 ):
     """Returnerar detaljer endast för säljaren."""
-    extras_total_full = (
-        magnet_count * EXTRA_MAGNET
-        + camera_count * EXTRA_CAMERA
-        + fire_count * EXTRA_FIRE
-    )
-
-    extras_charged = (
-        (magnet_count * EXTRA_MAGNET if charged_magnet else 0)
-        + (camera_count * EXTRA_CAMERA if charged_camera else 0)
-        + (fire_count * EXTRA_FIRE if charged_fire else 0)
-    )
-
-    lines = []
-    lines.append(f"### [{tag}] Detaljer för säljare")
-    lines.append(f"- Kundkategori: {'70+' if is_over_70 else 'Under 70'}")
-    lines.append(f"- Grundpris: {base_price:.0f} kr")
-    lines.append(f"- Tillval (alla): {extras_total_full:.0f} kr")
-    lines.append(f"- Tillval debiterade: {extras_charged:.0f} kr")
+    extras_block = ""
     if magnet_count > 0:
-        lines.append(
+        extras_block += (
             f"  - Extra magneter: {magnet_count} st á {EXTRA_MAGNET} kr "
-            f"({'debiteras' if charged_magnet else 'BJUDS'})"
+            f"({'debiteras' if charged_magnet else 'BJUDS'})\n"
         )
     if camera_count > 0:
-        lines.append(
+        extras_block += (
             f"  - Kameror: {camera_count} st á {EXTRA_CAMERA} kr "
-            f"({'debiteras' if charged_camera else 'BJUDS'})"
+            f"({'debiteras' if charged_camera else 'BJUDS'})\n"
         )
     if fire_count > 0:
-        lines.append(
+        extras_block += (
             f"  - Brandvarnare: {fire_count} st á {EXTRA_FIRE} kr "
-            f"({'debiteras' if charged_fire else 'BJUDS'})"
+            f"({'debiteras' if charged_fire else 'BJUDS'})\n"
         )
 
-    lines.append(f"- Installation: {INSTALLATION_COST:.0f} kr")
-    lines.append(f"- Finansierat belopp (exkl start): {financed_amount:.0f} kr")
-    lines.append(f"- Vald plan: {plan['label']} ({plan['months']} mån)")
-    lines.append(f"- Månadskostnad: {plan['monthly']:.2f} kr")
-    lines.append(f"- Totalkostnad inkl startavgift: {plan['total']:.2f} kr")
+    return (
+        f"### [{tag}] Detaljer för säljare\n"
+        f"- Kundkategori: {'70+' if is_over_70 else 'Under 70'}\n"
+        f"- Grundpris: {base_price:.0f} kr\n"
+        f"- Tillval (alla): {extras_total_full:.0f} kr\n"
+        f"- Tillval debiterade: {extras_charged:.0f} kr\n"
+        f"{extras_block}"
+        f"- Installation: {INSTALLATION_COST:.0f} kr\n"
+        f"- Finansierat belopp (exkl start): {financed_amount:.0f} kr\n"
+        f"- Vald plan: {plan['label']} ({plan['months']} mån)\n"
+        f"- Månadskostnad: {plan['monthly']:.2f} kr\n"
+        f"- Totalkostnad inkl startavgift: {plan['total']:.2f} kr"
+    )
 
-    return "\n".join(lines)
 
+def _migrate_legacy_customers():
+    """Engångskonvertering av gamla customers.json (JSON-lista) till JSON Lines."""
+    if os.path.exists(CUSTOMER_FILE) or not os.path.exists(LEGACY_CUSTOMER_FILE):
+        return
+    # Skriv till temporär fil och byt in den först när allt är skrivet, så att
+    # en avbruten migrering inte lämnar en halv .jsonl som stoppar nästa försök
+    tmp_file = CUSTOMER_FILE + ".tmp"
+    try:
+        with open(LEGACY_CUSTOMER_FILE, "r", encoding="utf-8") as f:
+            customers = json.load(f)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            for record in customers:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_file, CUSTOMER_FILE)
+    except Exception:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
+
+@st.cache_resource
 def load_customers():
+    """Läser sparade kunder en gång och delar listan mellan sessioner.
+
+    Listan är delad – kopiera den innan den ändras.
+    """
+    _migrate_legacy_customers()
+    customers = []
     if os.path.exists(CUSTOMER_FILE):
         try:
             with open(CUSTOMER_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+                for line in f:
+                    if not line.strip():
+                        continue
+                    # En trasig rad (t.ex. avbruten skrivning) hoppas över
+                    # utan att de övriga kunderna försvinner
+                    try:
+                        customers.append(json.loads(line))
+                    except ValueError:
+                        continue
         except Exception:
-            return []
-    return []
+            pass
+    return customers
 
 
-def save_customers(customers):
+def save_customer(record):
+    """Lägger till en kund sist i filen utan att skriva om tidigare rader."""
+    line = json.dumps(record, ensure_ascii=False) + "\n"
     try:
-        with open(CUSTOMER_FILE, "w", encoding="utf-8") as f:
-            json.dump(customers, f, ensure_ascii=False, indent=2)
+        # Saknar filen avslutande radbrytning (avbruten skrivning) börjar vi
+        # på ny rad, annars klistras posten ihop med den trasiga raden
+        if os.path.exists(CUSTOMER_FILE) and os.path.getsize(CUSTOMER_FILE) > 0:
+            with open(CUSTOMER_FILE, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = "\n" + line
+        with open(CUSTOMER_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
     except Exception:
         pass
 
 
 def generate_offer_text(
+    today,
     customer_name,
     customer_phone,
     customer_address,
@@ -190,69 +289,64 @@ def generate_offer_text(
     discount_percent_total,
     discount_percent_extras,
 ):
-    today = datetime.now().strftime("%Y-%m-%d %H:%M")
-
+    """Offert-text för kopiering; datumet (minutupplösning) skickas in."""
     plan_used = discount_plan or standard_plan
     label_used = "Rabatterat erbjudande" if discount_plan else "Standarderbjudande"
 
-    lines = []
-    lines.append("STL Kalkylator - Offert")
-    lines.append(f"Datum: {today}")
-    lines.append("")
-    lines.append(f"Kund: {customer_name or '-'}")
-    lines.append(f"Telefon: {customer_phone or '-'}")
-    lines.append(f"Adress: {customer_address or '-'}")
-    lines.append("")
-    if note:
-        lines.append(f"Anteckning: {note}")
-        lines.append("")
-    lines.append(f"Kundkategori: {'70+' if is_over_70 else 'Under 70'}")
-    lines.append(f"Grundpris paket: {base_price:.0f} kr")
-    lines.append(f"Tillval (totalt värde): {extras_total_full:.0f} kr")
-    lines.append(f"Tillval debiterade: {extras_charged:.0f} kr")
-    lines.append(f"Installation: {INSTALLATION_COST:.0f} kr")
+    note_block = f"Anteckning: {note}\n\n" if note else ""
+
+    counts_block = ""
     if magnet_count or camera_count or fire_count:
-        lines.append(f"- Magneter: {magnet_count} st")
-        lines.append(f"- Kameror: {camera_count} st")
-        lines.append(f"- Brandvarnare: {fire_count} st")
-    lines.append("")
-    lines.append(f"{label_used}:")
-    lines.append(
-        f"- Plan: {plan_used['label']} ({plan_used['months']} månader)"
-    )
-    lines.append(
-        f"- Månadskostnad (inkl admin): {plan_used['monthly']:.2f} kr/mån"
-    )
-    lines.append(
-        f"- Totalkostnad inkl startavgift: {plan_used['total']:.2f} kr"
-    )
-    lines.append("")
+        counts_block = (
+            f"- Magneter: {magnet_count} st\n"
+            f"- Kameror: {camera_count} st\n"
+            f"- Brandvarnare: {fire_count} st\n"
+        )
+
+    discount_block = ""
     if discount_plan and discount_amount_total > 0:
-        lines.append("Rabatt (jämfört med standard):")
-        lines.append(f"- Sparat belopp totalt: {discount_amount_total:.0f} kr")
-        lines.append(f"- Rabatt totalt: {discount_percent_total:.1f} %")
+        discount_block = (
+            "\nRabatt (jämfört med standard):\n"
+            f"- Sparat belopp totalt: {discount_amount_total:.0f} kr\n"
+            f"- Rabatt totalt: {discount_percent_total:.1f} %"
+        )
         if extras_total_full > 0:
-            lines.append(
-                f"- Rabatt på tillvalsvärde: {discount_percent_extras:.1f} %"
+            discount_block += (
+                f"\n- Rabatt på tillvalsvärde: {discount_percent_extras:.1f} %"
             )
-    return "\n".join(lines)
+
+    header = (
+        "STL Kalkylator - Offert\n"
+        f"Datum: {today}\n"
+        "\n"
+        f"Kund: {customer_name or '-'}\n"
+        f"Telefon: {customer_phone or '-'}\n"
+        f"Adress: {customer_address or '-'}\n"
+        "\n"
+    )
+    package = (
+        f"Kundkategori: {'70+' if is_over_70 else 'Under 70'}\n"
+        f"Grundpris paket: {base_price:.0f} kr\n"
+        f"Tillval (totalt värde): {extras_total_full:.0f} kr\n"
+        f"Tillval debiterade: {extras_charged:.0f} kr\n"
+        f"Installation: {INSTALLATION_COST:.0f} kr\n"
+    )
+    offer = (
+        "\n"
+        f"{label_used}:\n"
+        f"- Plan: {plan_used['label']} ({plan_used['months']} månader)\n"
+        f"- Månadskostnad (inkl admin): {plan_used['monthly']:.2f} kr/mån\n"
+        f"- Totalkostnad inkl startavgift: {plan_used['total']:.2f} kr\n"
+    )
+    return "".join(
+        (header, note_block, package, counts_block, offer, discount_block)
+    )
 
 
 def bonus_for_net_sales(net_sales: int) -> int:
     """Returnerar månadsbonus baserat på antal nettoförsäljningar."""
-    if net_sales >= 50:
-        return 50000
-    if net_sales >= 40:
-        return 40000
-    if net_sales >= 30:
-        return 30000
-    if net_sales >= 20:
-        return 15000
-    if net_sales >= 15:
-        return 10000
-    if net_sales >= 10:
-        return 5000
-    return 0
+    tier = np.searchsorted(_BONUS_THRESHOLDS, net_sales, side="right")
+    return int(_BONUS_VALUES[tier])
 
 
 # ----- STREAMLIT UI -----
@@ -264,7 +358,9 @@ st.title("📊 STL Kalkylator")
 
 # Session för kundlista
 if "customers" not in st.session_state:
-    st.session_state.customers = load_customers()
+    st.session_state.customers = list(load_customers())
+    # Tabellen byggs en gång per session och utökas vid varje sparning
+    st.session_state.customers_df = pd.DataFrame(st.session_state.customers)
 
 # ---- SIDOMENY ----
 
@@ -342,19 +438,27 @@ mobile_mode = st.sidebar.checkbox("Mobil-läge (1 kolumn)", value=False)
 
 # ---- BERÄKNINGAR FÖR STANDARDERBJUDANDE ----
 
-extras_total_full = (
-    magnet_count * EXTRA_MAGNET
-    + camera_count * EXTRA_CAMERA
-    + fire_count * EXTRA_FIRE
-)
+# Tillval i ordningen magnet, kamera, brandvarnare (som _EXTRA_PRICES)
+extra_counts = np.array([magnet_count, camera_count, fire_count], dtype=np.int64)
+extra_charged_mask = np.array([charged_magnet, charged_camera, charged_fire], dtype=bool)
+has_extras = bool(extra_counts.any())
+
+if has_extras:
+    extras_total_full = int(extra_counts @ _EXTRA_PRICES)
+    # Tillval som faktiskt debiteras (bjudna tillval räknas inte)
+    extras_charged = int((extra_counts * extra_charged_mask) @ _EXTRA_PRICES)
+else:
+    extras_total_full = 0
+    extras_charged = 0
+
+# Rabattläge: tillval finns och alla tillvalstyper debiteras inte
+any_bjuda = has_extras and not extra_charged_mask.all()
 
 financed_full = base_price + extras_total_full + INSTALLATION_COST
 plans_full = compute_plans(financed_full)
 
 # vald plan efter önskad bindningstid
-selected_plan_full = next(
-    p for p in plans_full if p["label"] == selected_term_label
-)
+selected_plan_full = plan_at(plans_full, term_labels.index(selected_term_label))
 
 best_budget_plan, budget_status = choose_best_plan_for_budget(
     plans_full, desired_monthly
@@ -412,16 +516,7 @@ with cols_standard[0]:
         )
 
 with cols_standard[-1]:
-    st.markdown("**Alla planer (utan rabatt)**")
-    st.dataframe(
-        {
-            "Plan": [p["label"] for p in plans_full],
-            "Månader": [p["months"] for p in plans_full],
-            "kr/mån": [round(p["monthly"], 2) for p in plans_full],
-            "Totalt (kr)": [round(p["total"], 2) for p in plans_full],
-        },
-        use_container_width=True,
-    )
+    show_plans_table("Alla planer (utan rabatt)", financed_full)
 
 with st.expander("Säljar-detaljer – Standard"):
     st.markdown(
@@ -434,6 +529,8 @@ with st.expander("Säljar-detaljer – Standard"):
             charged_magnet=True,
             charged_camera=True,
             charged_fire=True,
+            extras_total_full=extras_total_full,
+            extras_charged=extras_total_full,
             financed_amount=financed_full,
             plan=selected_plan_full,
             tag="STANDARD",
@@ -449,16 +546,7 @@ discount_amount_total = 0.0
 discount_percent_total = 0.0
 discount_percent_extras = 0.0
 
-if (
-    (magnet_count or camera_count or fire_count)
-    and (not charged_magnet or not charged_camera or not charged_fire)
-):
-    extras_charged = (
-        (magnet_count * EXTRA_MAGNET if charged_magnet else 0)
-        + (camera_count * EXTRA_CAMERA if charged_camera else 0)
-        + (fire_count * EXTRA_FIRE if charged_fire else 0)
-    )
-
+if any_bjuda:
     financed_discount = base_price + extras_charged + INSTALLATION_COST
     plans_discount = compute_plans(financed_discount)
 
@@ -525,16 +613,7 @@ if (
         )
 
     with cols_discount[-1]:
-        st.markdown("**Alla planer (med rabatt)**")
-        st.dataframe(
-            {
-                "Plan": [p["label"] for p in plans_discount],
-                "Månader": [p["months"] for p in plans_discount],
-                "kr/mån": [round(p["monthly"], 2) for p in plans_discount],
-                "Totalt (kr)": [round(p["total"], 2) for p in plans_discount],
-            },
-            use_container_width=True,
-        )
+        show_plans_table("Alla planer (med rabatt)", financed_discount)
 
     with st.expander("Säljar-detaljer – Rabatt"):
         st.markdown(
@@ -547,6 +626,8 @@ if (
                 charged_magnet,
                 charged_camera,
                 charged_fire,
+                extras_total_full=extras_total_full,
+                extras_charged=extras_charged,
                 financed_amount=financed_discount,
                 plan=discount_plan,
                 tag="RABATT",
@@ -566,7 +647,10 @@ offer_plan_for_calc = discount_plan or selected_plan_full
 
 cols_cp = st.columns(1 if mobile_mode else 2)
 
-with cols_cp[0]:
+
+@st.fragment
+def _competitor_panel(offer_plan_for_calc):
+    """Konkurrentjämförelse – körs om för sig när dess egna widgets ändras."""
     st.markdown("**Konkurrentjämförelse – hyra vs STL med sänkt serviceavgift**")
     st.write(
         "Antagande:\n"
@@ -594,49 +678,34 @@ with cols_cp[0]:
         if offer_plan_for_calc is None:
             st.warning("Ingen plan att jämföra mot ännu – räkna fram ett erbjudande först.")
         else:
-            horizons = [
-                ("3 år", 36),
-                ("5 år", 60),
-                ("10 år", 120),
-                ("15 år", 180),
-            ]
+            horizon_labels = ["3 år", "5 år", "10 år", "15 år"]
+            horizon_months = np.array([36, 60, 120, 180])
 
             our_monthly = offer_plan_for_calc["monthly"]   # full kostnad under bindningstid
             our_months = offer_plan_for_calc["months"]     # bindningstid
 
-            labels = []
-            years = []
-            our_costs = []
-            comp_costs = []
-            diffs = []
-
-            for label, months in horizons:
-                # STL total:
-                months_full = min(months, our_months)
-                cost_full = our_monthly * months_full
-                months_service = max(0, months - our_months)
-                cost_service = SERVICE_MONTHLY * months_service
-                our_total = START_FEE + cost_full + cost_service
-
-                # Konkurrent: hyrkoncept – samma månadskostnad hela perioden
-                comp_total = comp_start + comp_monthly * months
-
-                diff = comp_total - our_total
-
-                labels.append(label)
-                years.append(months / 12)
-                our_costs.append(round(our_total, 2))
-                comp_costs.append(round(comp_total, 2))
-                diffs.append(round(diff, 2))
+            # STL: full månadskostnad under bindningstiden, därefter service
+            months_full = np.minimum(horizon_months, our_months)
+            our_costs = (
+                START_FEE
+                + our_monthly * months_full
+                + SERVICE_MONTHLY * (horizon_months - months_full)
+            )
+            # Konkurrent: hyrkoncept – samma månadskostnad hela perioden
+            comp_costs = comp_start + comp_monthly * horizon_months
+            diffs = comp_costs - our_costs
+            years = horizon_months / 12
 
             st.markdown("**Totalkostnad över tid**")
             st.dataframe(
-                {
-                    "Period": labels,
-                    "STL totalt (service efter avbetalning)": our_costs,
-                    "Konkurrent totalt (hyra)": comp_costs,
-                    "Skillnad (konk - STL)": diffs,
-                },
+                pd.DataFrame(
+                    {
+                        "Period": horizon_labels,
+                        "STL totalt (service efter avbetalning)": our_costs,
+                        "Konkurrent totalt (hyra)": comp_costs,
+                        "Skillnad (konk - STL)": diffs,
+                    }
+                ).round(2),
                 use_container_width=True,
             )
 
@@ -647,22 +716,16 @@ with cols_cp[0]:
                     "STL (totalt)": our_costs,
                     "Konkurrent (totalt)": comp_costs,
                 }
-            ).set_index("År")
+            ).set_index("År").round(2)
             st.line_chart(df_graph_total)
 
             # Graf för att visa tydligt att STL sjunker till ~99 kr/mån
             st.markdown("**Graf – månadskostnad över tid**")
-            years_monthly = list(range(1, 16))  # år 1–15
-            stl_monthly_curve = []
-            comp_monthly_curve = []
-            for year in years_monthly:
-                months_elapsed = year * 12
-                if months_elapsed <= our_months:
-                    stl_m = our_monthly
-                else:
-                    stl_m = SERVICE_MONTHLY
-                stl_monthly_curve.append(round(stl_m, 2))
-                comp_monthly_curve.append(round(comp_monthly, 2))
+            years_monthly = np.arange(1, 16)  # år 1–15
+            stl_monthly_curve = np.where(
+                years_monthly * 12 <= our_months, our_monthly, SERVICE_MONTHLY
+            ).round(2)
+            comp_monthly_curve = np.full(years_monthly.shape, round(comp_monthly, 2))
 
             df_graph_monthly = pd.DataFrame(
                 {
@@ -682,22 +745,24 @@ with cols_cp[0]:
                 "- Ju längre period (t.ex. 10–15 år), desto större blir skillnaden till STL:s fördel."
             )
 
-with cols_cp[-1]:
+
+@st.fragment
+def _provision_panel(
+    offer_plan_for_calc,
+    discount_plan,
+    magnet_count,
+    camera_count,
+    fire_count,
+    charged_magnet,
+    charged_camera,
+    charged_fire,
+    extras_charged,
+    miles_driven,
+    net_sales_month,
+):
+    """Provision / bonus för aktuell affär."""
     st.markdown("**Provision / bonus för denna affär**")
     if offer_plan_for_calc:
-        # Merförsäljning = värdet av tillval kunden faktiskt betalar
-        extras_charged_final = (
-            (magnet_count * EXTRA_MAGNET if charged_magnet else 0)
-            + (camera_count * EXTRA_CAMERA if charged_camera else 0)
-            + (fire_count * EXTRA_FIRE if charged_fire else 0)
-        )
-
-        base_comm = BASE_COMMISSION_PER_DEAL
-        upsell_comm = extras_charged_final * UPSELL_COMMISSION_RATE
-        install_comm = INSTALLATION_COST * INSTALL_COMMISSION_RATE
-
-        total_before_comp = base_comm + upsell_comm + install_comm
-
         # Kundkompensation: om något bjuds eller rabatterad plan används
         has_comp = (
             (magnet_count and not charged_magnet)
@@ -706,20 +771,26 @@ with cols_cp[-1]:
             or (discount_plan is not None)
         )
 
-        if has_comp:
-            total_after_comp = total_before_comp * (1 - COMPENSATION_PENALTY_RATE)
-            comp_penalty = total_before_comp - total_after_comp
-        else:
-            total_after_comp = total_before_comp
-            comp_penalty = 0.0
+        # Ersättningsdelar: grundprovision, merförsäljning (tillval kunden
+        # faktiskt betalar), installation och milersättning
+        components = np.array(
+            [BASE_COMMISSION_PER_DEAL, extras_charged, INSTALLATION_COST, miles_driven],
+            dtype=np.float64,
+        )
+        rates = np.array([1.0, UPSELL_COMMISSION_RATE, INSTALL_COMMISSION_RATE, MILE_COMP])
+        base_comm, upsell_comm, install_comm, mile_comp_total = components * rates
 
-        mile_comp_total = miles_driven * MILE_COMP
+        # Kompensationsavdraget gäller provisionen, inte milersättningen
+        penalty_factor = (1 - COMPENSATION_PENALTY_RATE) if has_comp else 1.0
+        total_before_comp = base_comm + upsell_comm + install_comm
+        total_after_comp = total_before_comp * penalty_factor
+        comp_penalty = total_before_comp - total_after_comp
 
         monthly_bonus = bonus_for_net_sales(int(net_sales_month))
 
         st.write(f"Grundprovision per sålt paket: **{base_comm:.0f} kr**")
         st.write(
-            f"Merförsäljning (tillval debiterade: {extras_charged_final:.0f} kr) "
+            f"Merförsäljning (tillval debiterade: {extras_charged:.0f} kr) "
             f"→ 10% = **{upsell_comm:.0f} kr**"
         )
         st.write(
@@ -762,40 +833,91 @@ with cols_cp[-1]:
             "Ingen plan att räkna provision på än – räkna först fram ett erbjudande ovan."
         )
 
+
+with cols_cp[0]:
+    _competitor_panel(offer_plan_for_calc)
+
+with cols_cp[-1]:
+    _provision_panel(
+        offer_plan_for_calc,
+        discount_plan,
+        magnet_count,
+        camera_count,
+        fire_count,
+        charged_magnet,
+        charged_camera,
+        charged_fire,
+        extras_charged,
+        miles_driven,
+        net_sales_month,
+    )
+
 # ---- EXPORT & KUNDPROFILER ----
 
 st.subheader("4️⃣ Offert-text & Kundprofiler")
 
-extras_charged_final_for_text = (
-    (magnet_count * EXTRA_MAGNET if charged_magnet else 0)
-    + (camera_count * EXTRA_CAMERA if charged_camera else 0)
-    + (fire_count * EXTRA_FIRE if charged_fire else 0)
+offer_today = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+# Offert-texten skickas bara om till webbläsaren när något som påverkar den ändras
+offer_hash = hash(
+    (
+        offer_today,
+        customer_name,
+        customer_phone,
+        customer_address,
+        customer_note,
+        plan_key(selected_plan_full),
+        discount_plan and plan_key(discount_plan),
+        base_price,
+        is_over_70,
+        magnet_count,
+        camera_count,
+        fire_count,
+        extras_total_full,
+        extras_charged,
+        discount_amount_total,
+        discount_percent_total,
+        discount_percent_extras,
+    )
 )
+if st.session_state.get("_offer_hash") != offer_hash:
+    st.session_state["offer_text"] = generate_offer_text(
+        offer_today,
+        customer_name,
+        customer_phone,
+        customer_address,
+        customer_note,
+        standard_plan=selected_plan_full,
+        discount_plan=discount_plan,
+        base_price=base_price,
+        is_over_70=is_over_70,
+        magnet_count=magnet_count,
+        camera_count=camera_count,
+        fire_count=fire_count,
+        extras_total_full=extras_total_full,
+        extras_charged=extras_charged,
+        discount_amount_total=discount_amount_total,
+        discount_percent_total=discount_percent_total,
+        discount_percent_extras=discount_percent_extras,
+    )
+    st.session_state["_offer_hash"] = offer_hash
+
+
+@st.fragment
+def _saved_customers_panel():
+    """Lista över sparade kunder."""
+    with st.expander("Sparade kunder"):
+        if st.session_state.customers:
+            st.dataframe(st.session_state.customers_df, use_container_width=True)
+        else:
+            st.write("Inga kunder sparade ännu.")
 
-offer_text = generate_offer_text(
-    customer_name,
-    customer_phone,
-    customer_address,
-    customer_note,
-    standard_plan=selected_plan_full,
-    discount_plan=discount_plan,
-    base_price=base_price,
-    is_over_70=is_over_70,
-    magnet_count=magnet_count,
-    camera_count=camera_count,
-    fire_count=fire_count,
-    extras_total_full=extras_total_full,
-    extras_charged=extras_charged_final_for_text,
-    discount_amount_total=discount_amount_total,
-    discount_percent_total=discount_percent_total,
-    discount_percent_extras=discount_percent_extras,
-)
 
 cols_export = st.columns(1 if mobile_mode else 2)
 
 with cols_export[0]:
     st.markdown("**Offert-text (för kopiering / sms / mail)**")
-    st.text_area("Offert", offer_text, height=260)
+    st.text_area("Offert", key="offer_text", height=260)
 
 with cols_export[-1]:
     if st.button("💾 Spara kundprofil"):
@@ -815,11 +937,15 @@ with cols_export[-1]:
             "total": (offer_plan_for_calc["total"] if offer_plan_for_calc else 0),
         }
         st.session_state.customers.append(record)
-        save_customers(st.session_state.customers)
+        new_row = pd.DataFrame([record])
+        if st.session_state.customers_df.empty:
+            st.session_state.customers_df = new_row
+        else:
+            st.session_state.customers_df = pd.concat(
+                [st.session_state.customers_df, new_row], ignore_index=True
+            )
+        save_customer(record)
+        load_customers.clear()
         st.success("Kundprofil sparad.")
 
-    with st.expander("Sparade kunder"):
-        if st.session_state.customers:
-            st.dataframe(st.session_state.customers, use_container_width=True)
-        else:
-            st.write("Inga kunder sparade ännu.")
+    _saved_customers_panel()